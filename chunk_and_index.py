@@ -5,18 +5,210 @@ Works with:
  - extractor.py (your version)
  - local ollama models for LLM later (not needed for this file)
  - LangChain 1.x (not used here because we embed locally)
- - sentence-transformers + faiss-cpu
+ - sentence-transformers (ONNX Runtime backend) + faiss-cpu
 """
 
 import os
 import re
 import pickle
-from typing import List, Dict, Tuple
+import tempfile
+import functools
+import threading
+from collections import deque
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator
 
 import faiss
+import numpy as np
+import torch
+from cachetools import LRUCache
 from sentence_transformers import SentenceTransformer
 
+# Cap intra-op threads (the default of every core oversubscribes many-core
+# hosts) unless the operator already chose a count via OMP_NUM_THREADS,
+# which torch picks up on its own. Autograd is skipped per call with
+# torch.inference_mode() around encode, since grad mode is per-thread.
+if "OMP_NUM_THREADS" not in os.environ:
+    torch.set_num_threads(min(8, os.cpu_count() or 1))
+
 INDEX_DIR = "indexes"
+EMBED_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# Embedding backend: "onnx" runs the model through ONNX Runtime, "torch"
+# uses PyTorch eager mode. EMBED_ONNX_FILE picks the (int8 dynamically
+# quantized) ONNX export shipped with the model; set it to "" to use the
+# plain onnx/model.onnx, which sentence-transformers exports if missing.
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "onnx")
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "onnx/model_quint8_avx2.onnx")
+
+# Per-video indexes (tens to hundreds of chunks) use HNSW: no training,
+# graph search instead of brute force.
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 40
+HNSW_EF_SEARCH = 16
+
+# IVF-SQ8 settings. Indexes move from HNSW to IVF-SQ8 at IVF_TRAIN_THRESHOLD
+# vectors, once there are enough samples to train the coarse quantizer.
+# SQ8 stores each dimension as one byte (4x smaller than FP32) and keeps
+# better recall on MiniLM embeddings than PQ codes.
+IVF_NLIST = 256
+IVF_NPROBE = 8
+SQ_TYPE = faiss.ScalarQuantizer.QT_8bit
+IVF_TRAIN_THRESHOLD = 10_000
+
+_WORD = re.compile(r"\S+")
+
+# Query embeddings keyed by (model name, query text), shared by all
+# indexers so a repeated question skips encoding even after a video switch.
+_QUERY_EMB_CACHE = LRUCache(maxsize=1024)
+_QUERY_EMB_LOCK = threading.Lock()
+
+
+@functools.lru_cache(maxsize=4)
+def _load_model(model_name: str) -> SentenceTransformer:
+    """Load a sentence-transformers model once per process and reuse it."""
+    if EMBED_BACKEND == "onnx":
+        model_kwargs = {"file_name": EMBED_ONNX_FILE} if EMBED_ONNX_FILE else {}
+        model = SentenceTransformer(model_name, backend="onnx", model_kwargs=model_kwargs)
+    else:
+        model = SentenceTransformer(model_name)
+
+    # warm up tokenizer + kernels so the first query doesn't pay for it
+    with torch.inference_mode():
+        model.encode([""], convert_to_numpy=True, show_progress_bar=False)
+    return model
+
+
+def _temp_path(path: str) -> str:
+    """Create an empty temp file next to path (same filesystem, for os.replace)."""
+    fd, tmp = tempfile.mkstemp(
+        prefix=f".{os.path.basename(path)}.",
+        suffix=".tmp" + os.path.splitext(path)[1],  # keeps np.savez from adding .npz
+        dir=os.path.dirname(path)
+    )
+    os.close(fd)
+    return tmp
+
+
+class _StringColumn:
+    """Read-only string column: one UTF-8 blob plus row offsets."""
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    @classmethod
+    def from_list(cls, values: List[str]) -> "_StringColumn":
+        encoded = [v.encode("utf-8") for v in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(blob, offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx: int) -> str:
+        start, end = self.offsets[idx], self.offsets[idx + 1]
+        return self.blob[start:end].tobytes().decode("utf-8")
+
+    def tolist(self) -> List[str]:
+        return [self[i] for i in range(len(self))]
+
+
+class ChunkMetadata:
+    """
+    Struct-of-arrays store for chunk metadata.
+    While building, each field is a plain list. On disk (and after load)
+    int fields are int32 arrays and string fields are _StringColumns,
+    so loading creates no per-row Python objects; row() builds a dict
+    only for the hits a query actually returns.
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, object] = {}
+
+    def __len__(self) -> int:
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def check(self, rows: List[Dict]):
+        """
+        Raise ValueError unless every row has exactly the store's fields
+        (or, for an empty store, the first row's), so a bad row can neither
+        drop keys nor leave the columns misaligned.
+        """
+        if len(rows) == 0:
+            return
+        keys = set(self.columns) if self.columns else set(rows[0])
+        for i, row in enumerate(rows):
+            if set(row) != keys:
+                missing = ", ".join(sorted(keys - set(row))) or "none"
+                extra = ", ".join(sorted(set(row) - keys)) or "none"
+                raise ValueError(
+                    f"Metadata row {i} does not match fields {sorted(keys)} "
+                    f"(missing: {missing}; unexpected: {extra})"
+                )
+
+    def extend(self, rows: List[Dict]):
+        if len(rows) == 0:
+            return
+        self.check(rows)
+        if not self.columns:
+            self.columns = {key: [] for key in rows[0]}
+
+        for key, col in self.columns.items():
+            if not isinstance(col, list):
+                col = self.columns[key] = col.tolist()
+            col.extend(row[key] for row in rows)
+
+    def row(self, idx: int) -> Dict:
+        out = {}
+        for key, col in self.columns.items():
+            value = col[idx]
+            out[key] = value.item() if isinstance(value, np.generic) else value
+        return out
+
+    def save(self, path: str):
+        arrays = {}
+        for key, col in self.columns.items():
+            if isinstance(col, list):
+                if all(isinstance(v, int) and not isinstance(v, bool) for v in col):
+                    col = np.asarray(col, dtype=np.int32)
+                elif all(isinstance(v, str) for v in col):
+                    col = _StringColumn.from_list(col)
+                else:
+                    types = ", ".join(sorted({type(v).__name__ for v in col}))
+                    raise TypeError(
+                        f"Metadata field {key!r} must hold only ints or only strings, got: {types}"
+                    )
+
+            if isinstance(col, _StringColumn):
+                arrays[f"s.{key}.blob"] = col.blob
+                arrays[f"s.{key}.offsets"] = col.offsets
+            else:
+                arrays[f"i.{key}"] = col
+
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "ChunkMetadata":
+        store = cls()
+        with np.load(path) as data:
+            for name in data.files:
+                kind, key = name.split(".", 1)
+                if kind == "i":
+                    store.columns[key] = data[name]
+                elif key.endswith(".blob"):
+                    key = key[:-len(".blob")]
+                    store.columns[key] = _StringColumn(
+                        data[name], data[f"s.{key}.offsets"]
+                    )
+        return store
+
+    @classmethod
+    def from_rows(cls, rows: List[Dict]) -> "ChunkMetadata":
+        store = cls()
+        store.extend(rows)
+        return store
 
 
 class ChunkAndIndex:
@@ -25,25 +217,49 @@ class ChunkAndIndex:
     Uses sentence-transformers (MiniLM by default).
     """
 
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = EMBED_MODEL_NAME, batch_size: int = 64):
+        self.model = _load_model(model_name)
+        self.model_name = model_name
+        self.batch_size = batch_size
         self.dim = self.model.get_sentence_embedding_dimension()
 
-        # Cosine similarity → normalize + IndexFlatIP
-        self.index = faiss.IndexFlatIP(self.dim)
-        self.metadatas: List[Dict] = []
+        # Cosine similarity → normalize + inner product (HNSW, IVF-SQ8 once large enough)
+        self.index = self._build_hnsw_index()
+        self.metadatas = ChunkMetadata()
+        # True when the index is a read-only memory map of its file (see load)
+        self.mmapped = False
     
     def reset(self):
         """Reset the index and metadata (useful for creating a new index)."""
-        self.index = faiss.IndexFlatIP(self.dim)
-        self.metadatas: List[Dict] = []
+        self.index = self._build_hnsw_index()
+        self.metadatas = ChunkMetadata()
+        self.mmapped = False
+
+    def _build_hnsw_index(self) -> faiss.Index:
+        index = faiss.IndexHNSWFlat(self.dim, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+
+    def _build_ivf_index(self) -> faiss.Index:
+        quantizer = faiss.IndexFlatIP(self.dim)
+        return faiss.IndexIVFScalarQuantizer(
+            quantizer, self.dim, IVF_NLIST, SQ_TYPE,
+            faiss.METRIC_INNER_PRODUCT
+        )
 
-    # ---------------------------------------------------------
-    # -------------------- TEXT CLEANING -----------------------
-    # ---------------------------------------------------------
-    def _clean_text(self, text: str) -> str:
-        text = re.sub(r"\s+", " ", text)
-        return text.strip()
+    def _train_ivf_index(self, embeddings: np.ndarray):
+        """
+        Train an IVF-SQ8 index on every vector seen so far and
+        move them out of the current (HNSW or flat) index into it.
+        """
+        if self.index.ntotal > 0:
+            existing = self.index.reconstruct_n(0, self.index.ntotal)
+            embeddings = np.vstack([existing, embeddings])
+
+        index = self._build_ivf_index()
+        index.train(embeddings)
+        index.add(embeddings)
+        self.index = index
 
     # ---------------------------------------------------------
     # ---------------------  CHUNKING  -------------------------
@@ -53,40 +269,48 @@ class ChunkAndIndex:
         text: str,
         chunk_size: int = 500,
         overlap: int = 100
-    ) -> Tuple[List[str], List[Dict]]:
+    ) -> Iterator[Tuple[str, Dict]]:
         """
-        Chunk text by word count.
-        Returns:
-            chunks: list of chunk strings
-            metadatas: metadata list for FAISS indexing
+        Chunk text by word count, lazily.
+        Yields:
+            (chunk string, metadata dict for FAISS indexing)
+        Only the current window of chunk_size words is held in memory.
         """
-        cleaned = self._clean_text(text)
-        words = cleaned.split()
+        if not 0 <= overlap < chunk_size:
+            raise ValueError("overlap must be >= 0 and smaller than chunk_size")
 
-        if len(words) == 0:
-            return [], []
-
-        chunks = []
-        metas = []
-        i = 0
+        stride = chunk_size - overlap
+        window = deque()
+        start = 0
         chunk_id = 0
 
-        while i < len(words):
-            chunk_words = words[i:i + chunk_size]
-            chunk_text = " ".join(chunk_words)
-
-            chunks.append(chunk_text)
-            metas.append({
+        def emit():
+            chunk = " ".join(window)
+            return chunk, {
                 "chunk_id": chunk_id,
-                "text": chunk_text,
-                "word_start": i,
-                "word_end": i + len(chunk_words),
-            })
-
+                "text": chunk,
+                "word_start": start,
+                "word_end": start + len(window),
+            }
+
+        # \S+ runs on the raw text already yield whitespace-normalized words,
+        # so no cleaned copy (or per-word split) of the transcript is built
+        for match in _WORD.finditer(text):
+            window.append(match.group())
+            if len(window) == chunk_size:
+                yield emit()
+                for _ in range(stride):
+                    window.popleft()
+                start += stride
+                chunk_id += 1
+
+        # tail: windows that start before the end but run past it
+        while window:
+            yield emit()
+            for _ in range(min(stride, len(window))):
+                window.popleft()
+            start += stride
             chunk_id += 1
-            i += chunk_size - overlap
-
-        return chunks, metas
 
     # ---------------------------------------------------------
     # --------------------  EMBEDDING  -------------------------
@@ -98,16 +322,78 @@ class ChunkAndIndex:
         if len(texts) == 0:
             return
 
-        embeddings = self.model.encode(
-            texts,
-            convert_to_numpy=True,
-            show_progress_bar=False
-        )
+        # encode() length-sorts inputs per batch; normalizing there
+        # (for cosine similarity) saves a separate normalize_L2 pass
+        with torch.inference_mode():
+            embeddings = self.model.encode(
+                texts,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+                normalize_embeddings=True
+            )
+        self._add_embeddings(embeddings, metadatas)
+
+    def add_texts_from_iter(
+        self,
+        chunks: Iterable[Tuple[str, Dict]],
+        batch_size: Optional[int] = None,
+        pool: Optional[Dict] = None
+    ) -> int:
+        """
+        Embed (text, metadata) pairs from an iterator such as chunk_text(),
+        adding them to the index batch_size chunks at a time so encoding
+        starts before chunking finishes. Returns the number of chunks added.
+        """
+        batch_size = batch_size or self.batch_size
+        texts, metas = [], []
+        total = 0
+
+        for text, meta in chunks:
+            texts.append(text)
+            metas.append(meta)
+            if len(texts) == batch_size:
+                self.add_texts_bulk(texts, metas, pool)
+                total += len(texts)
+                texts, metas = [], []
+
+        if texts:
+            self.add_texts_bulk(texts, metas, pool)
+            total += len(texts)
+
+        return total
 
-        # normalize for cosine similarity
-        faiss.normalize_L2(embeddings)
+    def add_texts_bulk(self, texts: List[str], metadatas: List[Dict], pool: Optional[Dict]):
+        """
+        Like add_texts, but encodes on a sentence-transformers
+        multi-process pool (see start_multi_process_pool).
+        Falls back to add_texts when no pool is given.
+        """
+        if pool is None:
+            return self.add_texts(texts, metadatas)
+        if len(texts) == 0:
+            return
 
-        self.index.add(embeddings)
+        embeddings = self.model.encode_multi_process(
+            texts,
+            pool,
+            batch_size=self.batch_size,
+            normalize_embeddings=True
+        )
+        self._add_embeddings(embeddings, metadatas)
+
+    def _add_embeddings(self, embeddings: np.ndarray, metadatas: List[Dict]):
+        if self.mmapped:
+            # faiss aborts the process (not just raises) when growing mapped storage
+            raise RuntimeError("Index was loaded memory-mapped and is read-only; load it with mmap=False to add texts.")
+        # validate before touching the index so vectors and rows stay aligned
+        self.metadatas.check(metadatas)
+
+        is_ivf = isinstance(self.index, faiss.IndexIVF)
+        if not is_ivf and self.index.ntotal + len(embeddings) >= IVF_TRAIN_THRESHOLD:
+            self._train_ivf_index(embeddings)
+        else:
+            self.index.add(embeddings)
         self.metadatas.extend(metadatas)
 
     # ---------------------------------------------------------
@@ -120,29 +406,57 @@ class ChunkAndIndex:
         os.makedirs(INDEX_DIR, exist_ok=True)
 
         index_path = os.path.join(INDEX_DIR, f"{prefix}.index")
-        meta_path = os.path.join(INDEX_DIR, f"{prefix}.meta.pkl")
-
-        faiss.write_index(self.index, index_path)
-
-        with open(meta_path, "wb") as f:
-            pickle.dump(self.metadatas, f)
+        meta_path = os.path.join(INDEX_DIR, f"{prefix}.meta.npz")
+
+        # Write to temp files and os.replace them in: other indexers (or
+        # server workers) may have the old .index mmapped, and truncating it
+        # in place would SIGBUS them, while a replaced file keeps its inode
+        # alive for existing mappings. Metadata goes first: a bad field must
+        # fail before the .index file exists, since /process-video treats
+        # that file as "already indexed".
+        meta_tmp = _temp_path(meta_path)
+        index_tmp = _temp_path(index_path)
+        try:
+            self.metadatas.save(meta_tmp)
+            faiss.write_index(self.index, index_tmp)
+            os.replace(meta_tmp, meta_path)
+            os.replace(index_tmp, index_path)
+        finally:
+            for tmp in (meta_tmp, index_tmp):
+                if os.path.exists(tmp):
+                    os.remove(tmp)
 
     # ---------------------------------------------------------
     # ----------------------  LOAD  ----------------------------
     # ---------------------------------------------------------
-    def load(self, prefix: str = "default"):
+    def load(self, prefix: str = "default", mmap: bool = True):
+        """
+        Load FAISS index + metadata from ./indexes/
+        With mmap=True the index file is memory-mapped read-only
+        (IO_FLAG_MMAP_IFC: flat/HNSW vectors and IVF lists are used in place
+        from the mapping), so several server workers share one copy through
+        the OS page cache. An index loaded this way can't be added to; pass
+        mmap=False to extend a loaded index.
+        """
         index_path = os.path.join(INDEX_DIR, f"{prefix}.index")
-        meta_path = os.path.join(INDEX_DIR, f"{prefix}.meta.pkl")
+        meta_path = os.path.join(INDEX_DIR, f"{prefix}.meta.npz")
+        legacy_meta_path = os.path.join(INDEX_DIR, f"{prefix}.meta.pkl")
 
         if not os.path.exists(index_path):
             raise FileNotFoundError("FAISS index file missing.")
-        if not os.path.exists(meta_path):
+        if not os.path.exists(meta_path) and not os.path.exists(legacy_meta_path):
             raise FileNotFoundError("Metadata file missing.")
 
-        self.index = faiss.read_index(index_path)
+        io_flags = faiss.IO_FLAG_MMAP_IFC | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        self.index = faiss.read_index(index_path, io_flags)
+        self.mmapped = mmap
 
-        with open(meta_path, "rb") as f:
-            self.metadatas = pickle.load(f)
+        if os.path.exists(meta_path):
+            self.metadatas = ChunkMetadata.load(meta_path)
+        else:
+            # indexes saved before the columnar format: list of dicts
+            with open(legacy_meta_path, "rb") as f:
+                self.metadatas = ChunkMetadata.from_rows(pickle.load(f))
 
     # ---------------------------------------------------------
     # --------------------  RETRIEVAL  -------------------------
@@ -151,17 +465,59 @@ class ChunkAndIndex:
         """
         Return metadata for FAISS top_k results.
         """
-        q_emb = self.model.encode([query], convert_to_numpy=True)
-        faiss.normalize_L2(q_emb)
+        return self.query_batch([query], top_k=top_k)[0]
 
-        D, I = self.index.search(q_emb, top_k)
+    def query_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """
+        Like query, for several queries at once: one encode call and one
+        index.search over the (n_queries, dim) matrix.
+        Returns one top_k metadata list per query.
+        """
+        if len(queries) == 0:
+            return []
 
-        out = []
-        for idx in I[0]:
-            if 0 <= idx < len(self.metadatas):
-                out.append(self.metadatas[idx])
+        q_emb = self._encode_queries(queries)
 
-        return out
+        if isinstance(self.index, faiss.IndexIVF):
+            self.index.nprobe = IVF_NPROBE
+        elif isinstance(self.index, faiss.IndexHNSW):
+            self.index.hnsw.efSearch = max(HNSW_EF_SEARCH, top_k)
+
+        D, I = self.index.search(q_emb, top_k)
+
+        results = []
+        for row in I:
+            out = []
+            for idx in row:
+                if 0 <= idx < len(self.metadatas):
+                    out.append(self.metadatas.row(idx))
+            results.append(out)
+
+        return results
+
+    def _encode_queries(self, queries: List[str]) -> np.ndarray:
+        """Encode queries in one batch, reusing cached embeddings."""
+        keys = [(self.model_name, q) for q in queries]
+        with _QUERY_EMB_LOCK:
+            embs = [_QUERY_EMB_CACHE.get(key) for key in keys]
+
+        missing = [i for i, emb in enumerate(embs) if emb is None]
+        if missing:
+            with torch.inference_mode():
+                new_embs = self.model.encode(
+                    [queries[i] for i in missing],
+                    batch_size=32,
+                    convert_to_numpy=True,
+                    convert_to_tensor=False,
+                    show_progress_bar=False,
+                    normalize_embeddings=True
+                )
+            with _QUERY_EMB_LOCK:
+                for i, emb in zip(missing, new_embs):
+                    _QUERY_EMB_CACHE[keys[i]] = emb
+                    embs[i] = emb
+
+        return np.vstack(embs)
 
     def num_vectors(self) -> int:
         return self.index.ntotal
@@ -2,17 +2,18 @@
 import re
 from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled
 
+_VIDEO_ID_RES = [
+    re.compile(r"v=([a-zA-Z0-9_-]{11})"),
+    re.compile(r"youtu\.be/([a-zA-Z0-9_-]{11})"),
+    re.compile(r"youtube\.com/embed/([a-zA-Z0-9_-]{11})")
+]
+
 def extract_video_id(url: str) -> str:
     """
     Extracts the YouTube video ID from various URL formats.
     """
-    patterns = [
-        r"v=([a-zA-Z0-9_-]{11})",
-        r"youtu\.be/([a-zA-Z0-9_-]{11})",
-        r"youtube\.com/embed/([a-zA-Z0-9_-]{11})"
-    ]
-    for p in patterns:
-        match = re.search(p, url)
+    for pattern in _VIDEO_ID_RES:
+        match = pattern.search(url)
         if match:
             return match.group(1)
     raise ValueError(f"Could not extract video ID from URL: {url}")
@@ -49,8 +50,7 @@ def fetch_transcript(youtube_url: str,
     # transcript is a FetchedTranscript (iterable of snippets)
     # extract text from each snippet
     texts = [snippet.text for snippet in transcript]
-    cleaned = " ".join(texts)
-    cleaned = re.sub(r"\s+", " ", cleaned).strip()
+    cleaned = " ".join(" ".join(texts).split())
     if not cleaned:
         raise RuntimeError("Transcript is empty after fetch/clean.")
     return cleaned
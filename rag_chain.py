@@ -1,14 +1,25 @@
 # rag_chain.py
 
+from typing import Optional
+
 from chunk_and_index import ChunkAndIndex
 import ollama  # new API import
 
+# Rough Llama/Mistral tokenizer ratio for English text
+TOKENS_PER_WORD = 1.3
+# Chunks whose 5-word shingles overlap this much with a kept chunk are dropped
+DUPLICATE_JACCARD = 0.8
+
 class RAGChain:
-    def __init__(self, index_name: str = "video_index", model_name: str = "mistral", load_existing: bool = True):
-        # Initialize the indexer
-        self.indexer = ChunkAndIndex()
+    def __init__(self, index_name: str = "video_index", model_name: str = "mistral", load_existing: bool = True,
+                 max_context_tokens: int = 1500, max_answer_tokens: int = 256):
+        # Initialize the indexer. It is kept together with the id of the video
+        # it indexes in one tuple, so a swap from another thread is atomic.
+        self._active = (ChunkAndIndex(), None)
         self.index_name = index_name
         self.model_name = model_name
+        self.max_context_tokens = max_context_tokens
+        self.max_answer_tokens = max_answer_tokens
         
         # Optionally load existing index if it exists
         if load_existing:
@@ -18,17 +29,52 @@ class RAGChain:
                 # Index doesn't exist yet, will be created when video is processed
                 pass
 
-    def retrieve_chunks(self, query: str, top_k: int = 5):
+    @property
+    def indexer(self) -> ChunkAndIndex:
+        return self._active[0]
+
+    @property
+    def video_id(self):
+        return self._active[1]
+
+    def active_index(self):
+        """Current (indexer, video_id) pair, read in one step."""
+        return self._active
+
+    def retrieve_chunks(self, query: str, top_k: int = 5, indexer: Optional[ChunkAndIndex] = None):
         """Retrieve top-k relevant transcript chunks."""
-        return self.indexer.query(query, top_k=top_k)
+        return (indexer or self.indexer).query(query, top_k=top_k)
+
+    def build_context(self, chunks):
+        """
+        Join retrieved chunks (best first) within the max_context_tokens budget,
+        skipping near-duplicates. The chunk that crosses the budget is cut short.
+        """
+        budget = int(self.max_context_tokens / TOKENS_PER_WORD)
+        kept, kept_shingles = [], []
+
+        for c in chunks:
+            if budget <= 0:
+                break
+            words = c["text"].split()
+            shingles = {tuple(words[i:i + 5]) for i in range(max(1, len(words) - 4))}
+            if any(len(shingles & s) / len(shingles | s) >= DUPLICATE_JACCARD for s in kept_shingles):
+                continue
 
-    def generate_answer(self, query: str, top_k: int = 5):
+            kept.append(" ".join(words[:budget]))
+            kept_shingles.append(shingles)
+            budget -= len(words)
+
+        return "\n\n".join(kept)
+
+    def generate_answer(self, query: str, top_k: int = 5, indexer: Optional[ChunkAndIndex] = None):
         """
         Use Ollama to generate an answer based on retrieved chunks.
+        Pass indexer (from active_index) to pin retrieval to a specific index.
         Returns the full answer as a string.
         """
-        chunks = self.retrieve_chunks(query, top_k)
-        context = "\n\n".join([c["text"] for c in chunks])
+        chunks = self.retrieve_chunks(query, top_k, indexer=indexer)
+        context = self.build_context(chunks)
 
         messages = [
             {"role": "system", "content": "You are an assistant that answers based on context."},
@@ -36,13 +82,25 @@ class RAGChain:
         ]
 
         # Call Ollama and return the response text
-        response = ollama.chat(model=self.model_name, messages=messages)
+        response = ollama.chat(
+            model=self.model_name,
+            messages=messages,
+            options={"num_predict": self.max_answer_tokens}
+        )
         return response["message"]["content"]
     
-    def reload_index(self, index_name: str):
+    def reload_index(self, index_name: str, video_id: Optional[str] = None):
         """Reload the index from disk."""
+        # Load into a fresh indexer and swap it in, so a query running
+        # concurrently never sees a half-loaded index/metadata pair.
+        indexer = ChunkAndIndex()
+        indexer.load(index_name)
+        self.set_indexer(index_name, indexer, video_id)
+
+    def set_indexer(self, index_name: str, indexer: ChunkAndIndex, video_id: Optional[str] = None):
+        """Switch to an already-loaded indexer (for video_id, if known)."""
+        self._active = (indexer, video_id)
         self.index_name = index_name
-        self.indexer.load(index_name)
     
     def get_index_name(self) -> str:
         """Get current index name."""
@@ -10,7 +10,9 @@ def main():
 
     print("\n Chunking transcript...")
     indexer = ChunkAndIndex()
-    chunks,metas = indexer.chunk_text(transcript, chunk_size=500, overlap=100)
+    chunked = list(indexer.chunk_text(transcript, chunk_size=500, overlap=100))
+    chunks = [c for c, _ in chunked]
+    metas = [m for _, m in chunked]
     print(f"Total chunks created: {len(chunks)}")
 
     # Show preview